@@ -1,22 +1,286 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from PIL import Image
-import io
-from ..core.models import KTPData, ImageUploadResponse, ExtractionResponse
-from ..ml.models.document_analyzer import DocumentAnalyzer
-from ..ml.models.ocr_processor import OCRProcessor
-from ..ml.models.information_extractor import InformationExtractor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple, Union
+import asyncio
+import hashlib
+import logging
+import os
+import cv2
+import numpy as np
+import torch
+from ..core.models import (
+    KTPData, ValidatedKTPData, ImageUploadResponse, ExtractionResponse, BatchExtractionResponse
+)
+from ..ml.models.document_analyzer import get_document_analyzer
+from ..ml.models.ocr_processor import get_ocr_processor
+from ..ml.models.information_extractor import get_information_extractor
 from ..ml.preprocessors.image_preprocessor import ImagePreprocessor
 from ..core.config import get_settings
 from ..core.errors import KTPProcessingError, ValidationError
 
 router = APIRouter()
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-# Initialize ML models
-document_analyzer = DocumentAnalyzer()
-ocr_processor = OCRProcessor()
-info_extractor = InformationExtractor()
-image_preprocessor = ImagePreprocessor()
+# Settings read on every request, bound once at import
+_ALLOWED_IMAGE_TYPES = frozenset(settings.ALLOWED_IMAGE_TYPES)
+_MAX_CONTENT_LENGTH = settings.MAX_CONTENT_LENGTH
+_MAX_IMAGE_EDGE = settings.MAX_IMAGE_EDGE
+_RESULT_CACHE_SIZE = settings.RESULT_CACHE_SIZE
+_MAX_BATCH_SIZE = settings.MAX_BATCH_SIZE
+
+# Transformer models are loaded on first use (or by the startup warmup)
+image_preprocessor = ImagePreprocessor(denoise_mode=settings.DENOISE_MODE)
+
+# Decoding and model inference are CPU-bound and release the GIL, so they run
+# on a shared worker pool instead of blocking the event loop.
+_cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+def _default_pipeline_concurrency() -> int:
+    """One pipeline run per GPU, or a single run on CPU, where each forward
+    pass already spreads over all of torch's intra-op threads."""
+    if torch.cuda.is_available():
+        return torch.cuda.device_count()
+    return 1
+
+# Bound concurrent pipeline runs so simultaneous requests do not oversubscribe
+# the CPU or GPU memory; cached results and cheap endpoints skip this.
+_pipeline_semaphore = asyncio.Semaphore(
+    settings.PIPELINE_CONCURRENCY or _default_pipeline_concurrency()
+)
+
+# Pipeline results keyed by (upload digest, bypass_validation), least recent first
+_result_cache: "OrderedDict[Tuple[bytes, bool], Tuple[KTPData, float]]" = OrderedDict()
+
+async def _run_in_pool(fn, *args, **kwargs):
+    """Run a blocking callable on the shared CPU pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_pool, partial(fn, *args, **kwargs))
+
+async def _stage(error_prefix: str, fn, *args, **kwargs):
+    """Run one pipeline stage on the CPU pool, tagging failures with the stage."""
+    try:
+        return await _run_in_pool(fn, *args, **kwargs)
+    except Exception as e:
+        raise ValidationError(f"{error_prefix}: {str(e)}") from e
+
+def _hash_upload(fileobj) -> bytes:
+    """Check the size of a spooled upload and return a digest of its contents."""
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    if not size:
+        raise ValidationError("Empty file uploaded")
+    if size > _MAX_CONTENT_LENGTH:
+        raise ValidationError(
+            f"File too large: {size} bytes. Maximum size is {_MAX_CONTENT_LENGTH} bytes"
+        )
+    fileobj.seek(0)
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(partial(fileobj.read, 1024 * 1024), b""):
+        digest.update(chunk)
+    return digest.digest()
+
+def _open_upload(fileobj) -> np.ndarray:
+    """Decode an uploaded image into a BGR array with OpenCV.
+
+    The array is handed straight to the preprocessor, which works in BGR,
+    so no PIL buffer or extra colour conversion is involved.
+    """
+    fileobj.seek(0)
+    buffer = np.frombuffer(fileobj.read(), dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValidationError("Could not decode image data")
+    
+    # KTP recognition does not need more than MAX_IMAGE_EDGE pixels
+    height, width = image.shape[:2]
+    scale = _MAX_IMAGE_EDGE / max(height, width)
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (int(width * scale), int(height * scale)),
+            interpolation=cv2.INTER_AREA
+        )
+    return image
+
+# A pipeline outcome per image: the extracted data with its layout
+# confidence, or the ValidationError that rejected that image
+PipelineResult = Union[Tuple[KTPData, float], ValidationError]
+
+def _failed(outcome) -> bool:
+    """Check whether a gathered stage outcome is a per-image ValidationError.
+    
+    Any other exception (e.g. cancellation) is re-raised.
+    """
+    if isinstance(outcome, ValidationError):
+        return True
+    if isinstance(outcome, BaseException):
+        raise outcome
+    return False
+
+async def _run_ktp_pipeline(image: np.ndarray, bypass_validation: bool) -> Tuple[KTPData, float]:
+    """Run preprocessing, layout analysis, OCR and extraction on a decoded image.
+    
+    Returns the extracted KTP data together with the layout confidence score.
+    """
+    result = (await _run_ktp_pipeline_batch([image], bypass_validation))[0]
+    if isinstance(result, ValidationError):
+        raise result
+    return result
+
+async def _run_ktp_pipeline_batch(
+    images: List[np.ndarray],
+    bypass_validation: bool
+) -> List[PipelineResult]:
+    """Run the KTP pipeline on several decoded images.
+    
+    Preprocessing runs per image in parallel on the CPU pool, while layout
+    analysis, OCR and extraction feed the whole batch through each model in
+    a single forward pass. An image that fails validation gets its own
+    ValidationError in the results and drops out of the later stages; only
+    a model stage failing outright fails the whole batch.
+    """
+    # Resolved on the event loop thread so each model is only loaded once
+    document_analyzer = get_document_analyzer()
+    ocr_processor = get_ocr_processor()
+    info_extractor = get_information_extractor()
+    
+    results: List[Optional[PipelineResult]] = [None] * len(images)
+    
+    async with _pipeline_semaphore:
+        # Preprocess images with bypass_validation setting
+        preprocessed = await asyncio.gather(*(
+            _stage(
+                "Image preprocessing failed",
+                image_preprocessor.preprocess, image, bypass_validation=bypass_validation
+            )
+            for image in images
+        ), return_exceptions=True)
+        pending = []
+        for index, outcome in enumerate(preprocessed):
+            if _failed(outcome):
+                results[index] = outcome
+            else:
+                pending.append(index)
+        
+        # Analyze document layouts
+        layouts = {}
+        if pending:
+            layout_batch = await _stage(
+                "Document analysis failed",
+                document_analyzer.analyze_layout_batch, [preprocessed[index] for index in pending]
+            )
+            layouts = dict(zip(pending, layout_batch))
+        for index in pending:
+            if not bypass_validation and not layouts[index]["is_ktp"]:
+                results[index] = ValidationError(
+                    "The uploaded image does not appear to be a valid KTP. " +
+                    f"Confidence score: {layouts[index]['confidence']:.2f}"
+                )
+        pending = [index for index in pending if results[index] is None]
+        
+        # Extract text from regions
+        text_regions = {}
+        if pending:
+            text_regions_batch = await _stage(
+                "OCR processing failed",
+                ocr_processor.process_image_batch, [preprocessed[index] for index in pending]
+            )
+            text_regions = dict(zip(pending, text_regions_batch))
+        for index in pending:
+            if not bypass_validation and not text_regions[index]:
+                results[index] = ValidationError("No text could be extracted from the image")
+        pending = [index for index in pending if results[index] is None]
+        
+        # Extract structured information
+        extracted_infos = {}
+        if pending:
+            extracted_batch = await _stage(
+                "Information extraction failed",
+                info_extractor.extract_information_batch, [text_regions[index] for index in pending]
+            )
+            extracted_infos = dict(zip(pending, extracted_batch))
+        for index in pending:
+            if not bypass_validation and not extracted_infos[index]:
+                results[index] = ValidationError("Could not extract KTP information from the image")
+        pending = [index for index in pending if results[index] is None]
+    
+    # Only run the per-field format checks when validation is requested
+    model = KTPData if bypass_validation else ValidatedKTPData
+    for index in pending:
+        try:
+            results[index] = (model(**extracted_infos[index]), layouts[index]["confidence"])
+        except Exception as e:
+            results[index] = ValidationError(f"Invalid KTP data format: {str(e)}")
+    
+    return results
+
+async def warmup_pipeline() -> None:
+    """Run a blank image through the pipeline so that lazy model initialisation
+    happens at startup instead of on the first request."""
+    blank = np.full((512, 512, 3), 255, dtype=np.uint8)
+    try:
+        await _run_ktp_pipeline(blank, bypass_validation=True)
+    except Exception as e:
+        logger.warning(f"Pipeline warmup failed: {str(e)}")
+
+async def _process_upload(file: UploadFile, bypass_validation: bool) -> Tuple[KTPData, float]:
+    """Run the pipeline on an upload, reusing the result for repeated files."""
+    result = (await _process_uploads([file], bypass_validation))[0]
+    if isinstance(result, ValidationError):
+        raise result
+    return result
+
+async def _process_uploads(
+    files: List[UploadFile],
+    bypass_validation: bool
+) -> List[PipelineResult]:
+    """Run the pipeline on several uploads, batching the ones not yet cached.
+    
+    Uploads that cannot be read or fail validation get their ValidationError
+    in place of a result instead of failing the others.
+    """
+    digests = await asyncio.gather(*(
+        _stage("Invalid image file", _hash_upload, file.file) for file in files
+    ), return_exceptions=True)
+    keys = [(digest, bypass_validation) for digest in digests]
+    
+    results: List[Optional[PipelineResult]] = []
+    for digest, key in zip(digests, keys):
+        if _failed(digest):
+            results.append(digest)
+            continue
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+        results.append(cached)
+    
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        images = await asyncio.gather(*(
+            _stage("Invalid image file", _open_upload, files[index].file) for index in missing
+        ), return_exceptions=True)
+        decoded = []
+        for index, image in zip(missing, images):
+            if _failed(image):
+                results[index] = image
+            else:
+                decoded.append((index, image))
+        
+        if decoded:
+            processed = await _run_ktp_pipeline_batch(
+                [image for _, image in decoded], bypass_validation
+            )
+            for (index, _), result in zip(decoded, processed):
+                results[index] = result
+                if not isinstance(result, ValidationError):
+                    _result_cache[keys[index]] = result
+            while len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+    
+    return results
 
 @router.post("/upload", response_model=KTPData)
 async def process_ktp(
@@ -26,58 +290,14 @@ async def process_ktp(
     """Process uploaded KTP image and extract information."""
     try:
         # Validate file type (skip if bypassing validation)
-        if not bypass_validation and not file.content_type in ["image/jpeg", "image/png"]:
+        if not bypass_validation and file.content_type not in _ALLOWED_IMAGE_TYPES:
             raise ValidationError(
                 f"Unsupported file type: {file.content_type}. Only JPEG and PNG images are supported"
             )
             
-        # Read and validate file content
-        try:
-            contents = await file.read()
-            if not contents:
-                raise ValidationError("Empty file uploaded")
-            image = Image.open(io.BytesIO(contents))
-        except Exception as e:
-            raise ValidationError(f"Invalid image file: {str(e)}")
-        
-        try:
-            # Preprocess image with bypass_validation setting
-            preprocessed_image = image_preprocessor.preprocess(image, bypass_validation=bypass_validation)
-        except Exception as e:
-            raise ValidationError(f"Image preprocessing failed: {str(e)}")
-            
-        # Analyze document layout
-        try:
-            layout_info = document_analyzer.analyze_layout(preprocessed_image)
-            if not bypass_validation and not layout_info["is_ktp"]:
-                raise ValidationError(
-                    "The uploaded image does not appear to be a valid KTP. " +
-                    f"Confidence score: {layout_info['confidence']:.2f}"
-                )
-        except Exception as e:
-            raise ValidationError(f"Document analysis failed: {str(e)}")
-            
-        # Extract text from regions
-        try:
-            text_regions = ocr_processor.process_image(preprocessed_image)
-            if not text_regions and not bypass_validation:
-                raise ValidationError("No text could be extracted from the image")
-        except Exception as e:
-            raise ValidationError(f"OCR processing failed: {str(e)}")
-        
-        # Extract structured information
-        try:
-            ktp_data = info_extractor.extract_information(text_regions)
-            if not ktp_data and not bypass_validation:
-                raise ValidationError("Could not extract KTP information from the image")
-        except Exception as e:
-            raise ValidationError(f"Information extraction failed: {str(e)}")
-        
-        # Create and validate KTPData model with bypass_validation flag
-        try:
-            return KTPData(bypass_validation=bypass_validation, **ktp_data)
-        except Exception as e:
-            raise ValidationError(f"Invalid KTP data format: {str(e)}")
+        # Read, validate and process file content
+        ktp_data, _ = await _process_upload(file, bypass_validation)
+        return ktp_data
         
     except ValidationError as e:
         raise HTTPException(
@@ -102,36 +322,8 @@ async def extract_information(
 ):
     """Extract information from a KTP image."""
     try:
-        # Read file contents
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Preprocess image
-        preprocessed_image = image_preprocessor.preprocess(image, bypass_validation=bypass_validation)
-        
-        # Analyze document layout
-        layout_info = document_analyzer.analyze_layout(preprocessed_image)
-        if not bypass_validation and not layout_info["is_ktp"]:
-            raise ValidationError(
-                "The uploaded image does not appear to be a valid KTP. " +
-                f"Confidence score: {layout_info['confidence']:.2f}"
-            )
-            
-        # Extract text from image
-        text_regions = ocr_processor.process_image(preprocessed_image)
-        if not text_regions and not bypass_validation:
-            raise ValidationError("No text could be extracted from the image")
-            
-        # Extract structured information
-        extracted_info = info_extractor.extract_information(text_regions)
-        if not extracted_info and not bypass_validation:
-            raise ValidationError("Could not extract KTP information from the image")
-            
-        # Calculate confidence score based on layout and extraction results
-        confidence_score = layout_info["confidence"]
-        
-        # Create KTP data model
-        ktp_data = KTPData(bypass_validation=bypass_validation, **extracted_info)
+        # Decode the uploaded image and run the shared pipeline
+        ktp_data, confidence_score = await _process_upload(file, bypass_validation)
         
         return ExtractionResponse(
             ktp_data=ktp_data,
@@ -149,6 +341,45 @@ async def extract_information(
             detail={"error": f"Failed to process image: {str(e)}"}
         )
 
+@router.post("/batch", response_model=List[BatchExtractionResponse])
+async def extract_batch(
+    files: List[UploadFile] = File(...),
+    bypass_validation: bool = Query(False, description="Whether to bypass validation checks")
+):
+    """Extract information from several KTP images with batched model inference.
+    
+    Each file gets its own entry, in upload order, holding either the
+    extraction result or the reason that file was rejected.
+    """
+    try:
+        if len(files) > _MAX_BATCH_SIZE:
+            raise ValidationError(
+                f"Too many files: {len(files)}. Maximum batch size is {_MAX_BATCH_SIZE}"
+            )
+        
+        results = await _process_uploads(files, bypass_validation)
+        
+        return [
+            BatchExtractionResponse(filename=file.filename, error=str(result))
+            if isinstance(result, ValidationError) else
+            BatchExtractionResponse(
+                filename=file.filename,
+                result=ExtractionResponse(ktp_data=result[0], confidence_score=result[1])
+            )
+            for file, result in zip(files, results)
+        ]
+        
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": str(e)}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"error": f"Failed to process images: {str(e)}"}
+        )
+
 @router.get("/export/{format}")
 async def export_data(format: str, ktp_data: KTPData):
     if format not in ["json", "csv"]:
@@ -166,9 +397,9 @@ async def health_check():
     try:
         # Verify models are loaded
         models_status = {
-            "document_analyzer": document_analyzer is not None,
-            "ocr_processor": ocr_processor is not None,
-            "info_extractor": info_extractor is not None
+            "document_analyzer": get_document_analyzer.cache_info().currsize > 0,
+            "ocr_processor": get_ocr_processor.cache_info().currsize > 0,
+            "info_extractor": get_information_extractor.cache_info().currsize > 0
         }
         
         if all(models_status.values()):
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # API Settings
@@ -16,10 +16,19 @@ class Settings(BaseSettings):
     # Security Settings
     MAX_CONTENT_LENGTH: int = 10 * 1024 * 1024  # 10MB max file size
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png"]
+    MAX_IMAGE_EDGE: int = 1024  # Longest edge kept after decoding uploads
+    DENOISE_MODE: str = "quality"  # Preprocessing denoiser: quality, edge or fast
+    OPENCV_THREADS: Optional[int] = 1  # OpenCV threads per call (None: OpenCV default)
     
     # ML Model Settings
     MODEL_CONFIDENCE_THRESHOLD: float = 0.8
     USE_GPU: bool = True
+    COMPILE_MODELS: bool = True  # torch.compile the models when running on GPU
+    QUANTIZE_MODELS: bool = True  # Dynamic int8 quantization when running on CPU
+    RESULT_CACHE_SIZE: int = 512  # Extraction results kept per upload hash
+    WARMUP_MODELS: bool = True  # Run a dummy inference at startup
+    MAX_BATCH_SIZE: int = 16  # Maximum images per /batch request
+    PIPELINE_CONCURRENCY: Optional[int] = None  # Concurrent pipeline runs (default: 1 on CPU, GPU count on CUDA)
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
@@ -1,11 +1,5 @@
-from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-import logging
 from typing import Optional, Dict, Any
 
-logger = logging.getLogger(__name__)
-
 class KTPProcessingError(Exception):
     """Base exception for KTP processing errors."""
     def __init__(
@@ -63,26 +57,3 @@ class PreprocessingError(KTPProcessingError):
             status_code=400,
             details=details
         )
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        try:
-            return await call_next(request)
-        except KTPProcessingError as e:
-            logger.error(f"KTP Processing error: {str(e)}")
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"error": str(e)}
-            )
-        except HTTPException as e:
-            logger.error(f"HTTP error: {str(e)}")
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"error": str(e.detail)}
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"error": "An unexpected error occurred"}
-            )
\ No newline at end of file
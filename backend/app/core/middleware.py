@@ -1,9 +1,10 @@
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-from collections import defaultdict
-import asyncio
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from collections import OrderedDict
+from typing import Optional, Tuple
+import time
 from .config import get_settings
 from .errors import KTPProcessingError
 import logging
@@ -11,36 +12,44 @@ import logging
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
+class KTPMiddleware:
+    """Request timing, rate limiting and error translation in one ASGI layer.
+    
+    Written as plain ASGI rather than three stacked ``BaseHTTPMiddleware``
+    classes, each of which wrapped every request in an extra task and
+    response stream.
+    """
+    
+    def __init__(self, app: ASGIApp, requests_per_minute: int = 60, max_clients: int = 10000):
+        self.app = app
         self.requests_per_minute = requests_per_minute
-        self.request_history = defaultdict(list)
-        self.cleanup_task = None
+        self.max_clients = max_clients
+        self.refill_rate = requests_per_minute / 60.0  # Tokens regained per second
+        # Token bucket per IP as (tokens, last_refill), least recently seen first
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-    async def dispatch(self, request: Request, call_next):
-        # Get client IP, preferring X-Forwarded-For header for proxy support
-        client_ip = request.headers.get("X-Forwarded-For", request.client.host)
-        if isinstance(client_ip, str) and "," in client_ip:
-            client_ip = client_ip.split(",")[0].strip()
-            
-        now = datetime.now()
+        start_time = time.perf_counter()
+        path = scope["path"]
+        response_started = False
         
-        # Skip rate limiting for health check endpoint only
-        if request.url.path == '/health':
-            return await call_next(request)
+        async def send_with_process_time(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                process_time = time.perf_counter() - start_time
+                MutableHeaders(scope=message).append("X-Process-Time", f"{process_time:.6f}")
+            await send(message)
         
-        # Clean old requests before checking limits
+        response = None
         try:
-            self.request_history[client_ip] = [
-                req_time for req_time in self.request_history[client_ip]
-                if isinstance(req_time, datetime) and (now - req_time).total_seconds() < 60
-            ]
-            
-            # Check rate limit
-            if len(self.request_history[client_ip]) >= self.requests_per_minute:
-                logger.warning(f"Rate limit exceeded for IP: {client_ip}")
-                return JSONResponse(
+            # Skip rate limiting for health check endpoint only
+            if path != '/health' and not self._allow_request(self._client_ip(scope)):
+                response = ORJSONResponse(
                     status_code=429,
                     content={
                         "error": "Too many requests. Please try again later.",
@@ -48,56 +57,73 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                         "retry_after": "60 seconds"
                     }
                 )
-            
-            # Add current request
-            self.request_history[client_ip].append(now)
-            
-            # Start cleanup task if not running
-            if not self.cleanup_task or self.cleanup_task.done():
-                self.cleanup_task = asyncio.create_task(self._cleanup_old_requests())
-                
+            else:
+                await self.app(scope, receive, send_with_process_time)
         except Exception as e:
-            logger.error(f"Error in rate limiting: {str(e)}")
-            # On error, allow the request through
-            return await call_next(request)
+            if response_started:
+                raise
+            response = self._error_response(e)
         
-        return await call_next(request)
+        if response is not None:
+            await response(scope, receive, send_with_process_time)
+        
+        # Log processing time for endpoints except health checks
+        if path != '/health':
+            process_time = time.perf_counter() - start_time
+            logger.info(f"Processing time for {path}: {process_time:.3f}s")
     
-    async def _cleanup_old_requests(self):
-        """Clean up old request records periodically."""
-        try:
-            for _ in range(10):  # Run cleanup for 10 iterations
-                await asyncio.sleep(10)  # Run every 10 seconds
-                now = datetime.now()
-                
-                # Use list() to avoid runtime modification errors
-                for ip in list(self.request_history.keys()):
-                    try:
-                        self.request_history[ip] = [
-                            req_time for req_time in self.request_history[ip]
-                            if isinstance(req_time, datetime) and (now - req_time).total_seconds() < 60
-                        ]
-                        if not self.request_history[ip]:
-                            del self.request_history[ip]
-                    except Exception as e:
-                        logger.error(f"Error cleaning up requests for IP {ip}: {str(e)}")
-                        continue
-        except asyncio.CancelledError:
-            # Handle task cancellation gracefully
-            pass
-        except Exception as e:
-            logger.error(f"Error in cleanup task: {str(e)}")
-
-class ProcessingTimeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = datetime.now()
-        response = await call_next(request)
-        process_time = (datetime.now() - start_time).total_seconds()
+    def _client_ip(self, scope: Scope) -> str:
+        """Get client IP, preferring X-Forwarded-For header for proxy support."""
+        forwarded_for: Optional[str] = Headers(scope=scope).get("X-Forwarded-For")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+    
+    def _allow_request(self, client_ip: str) -> bool:
+        """Take a token from the client's bucket, refilling it first."""
+        now = time.monotonic()
+        bucket = self.buckets.get(client_ip)
+        if bucket is None:
+            tokens = float(self.requests_per_minute)
+        else:
+            tokens, last_refill = bucket
+            tokens = min(
+                float(self.requests_per_minute),
+                tokens + (now - last_refill) * self.refill_rate
+            )
         
-        response.headers["X-Process-Time"] = str(process_time)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
         
-        # Log processing time for endpoints except health checks
-        if not request.url.path == '/health':
-            logger.info(f"Processing time for {request.url.path}: {process_time:.3f}s")
+        self.buckets[client_ip] = (tokens, now)
+        self.buckets.move_to_end(client_ip)
+        
+        # Evict the least recently seen client once over capacity
+        if len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
         
-        return response
\ No newline at end of file
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        return allowed
+    
+    def _error_response(self, error: Exception) -> ORJSONResponse:
+        """Translate an exception raised by the application into a JSON response."""
+        if isinstance(error, KTPProcessingError):
+            logger.error(f"KTP Processing error: {str(error)}")
+            return ORJSONResponse(
+                status_code=error.status_code,
+                content={"error": str(error)}
+            )
+        if isinstance(error, HTTPException):
+            logger.error(f"HTTP error: {str(error)}")
+            return ORJSONResponse(
+                status_code=error.status_code,
+                content={"error": str(error.detail)}
+            )
+        logger.error(f"Unexpected error: {str(error)}")
+        return ORJSONResponse(
+            status_code=500,
+            content={"error": "An unexpected error occurred"}
+        )
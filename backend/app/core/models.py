@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, ClassVar
 from datetime import date
 import re
@@ -12,6 +12,9 @@ from .validators import (
 from .validators import validate_nik, validate_name, validate_date
 from .validators import validate_birth_place, validate_address  
 class KTPData(BaseModel):
+    # Instances are shared through the result cache, so keep them immutable
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True)
+
     nik: str = Field(..., description="16-digit National ID Number")
     name: str = Field(..., description="Full name as appears on ID")
     birth_place: str = Field(..., description="Place of birth")
@@ -25,92 +28,86 @@ class KTPData(BaseModel):
     nationality: Optional[str] = Field(None, description="Nationality (default: WNI)")
     valid_until: Optional[str] = Field(None, description="ID validity date or SEUMUR HIDUP")
 
-    model_config = {
-        "bypass_validation": True
-    }
+    @field_validator('nationality')
+    def default_nationality_field(cls, v):
+        return v or 'WNI'
+
+class ValidatedKTPData(KTPData):
+    """KTPData with every field checked against KTP format rules.
+
+    ``KTPData`` itself performs no format checks, so callers that bypass
+    validation pay nothing for the field validators below.
+    """
 
     @field_validator('nik')
     def validate_nik_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_nik(v, bypass):
+        if not validate_nik(v):
             raise ValueError('NIK must be exactly 16 digits')
         return v
 
     @field_validator('name')
     def validate_name_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_name(v, bypass):
+        if not validate_name(v):
             raise ValueError('Name must contain only uppercase letters, spaces, and allowed punctuation')
         return v
 
     @field_validator('birth_place')
     def validate_birth_place_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_birth_place(v, bypass):
+        if not validate_birth_place(v):
             raise ValueError('Birth place must be in uppercase letters')
         return v
 
     @field_validator('birth_date')
     def validate_birth_date_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_date(v, bypass):
+        if not validate_date(v):
             raise ValueError('Birth date must be in DD-MM-YYYY format')
         return v
 
     @field_validator('address')
     def validate_address_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_address(v, bypass):
+        if not validate_address(v):
             raise ValueError('Address must be in uppercase and contain RT/RW information')
         return v
 
     @field_validator('religion')
     def validate_religion_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if v and not validate_religion(v, bypass):
+        if v and not validate_religion(v):
             raise ValueError('Invalid religion value')
         return v
 
     @field_validator('marital_status')
     def validate_marital_status_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if v and not validate_marital_status(v, bypass):
+        if v and not validate_marital_status(v):
             raise ValueError('Invalid marital status')
         return v
 
     @field_validator('blood_type')
     def validate_blood_type_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if v and not validate_blood_type(v, bypass):
+        if v and not validate_blood_type(v):
             raise ValueError('Invalid blood type')
         return v
 
     @field_validator('gender')
     def validate_gender_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if not validate_gender(v, bypass):
+        if not validate_gender(v):
             raise ValueError('Gender must be either LAKI-LAKI or PEREMPUAN')
         return v
 
     @field_validator('nationality')
     def validate_nationality_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        v = v or 'WNI'
-        if not validate_nationality(v, bypass):
+        if not validate_nationality(v):
             raise ValueError('Nationality must be either WNI or WNA')
         return v
 
     @field_validator('occupation')
     def validate_occupation_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if v and not validate_occupation(v, bypass):
+        if v and not validate_occupation(v):
             raise ValueError('Occupation must be in uppercase letters')
         return v
 
     @field_validator('valid_until')
     def validate_valid_until_field(cls, v):
-        bypass = cls.model_config.get("bypass_validation", True)
-        if v and not validate_valid_until(v, bypass):
+        if v and not validate_valid_until(v):
             raise ValueError('Valid until must be either SEUMUR HIDUP or a future date in DD-MM-YYYY format')
         return v
 
@@ -126,4 +123,9 @@ class ExtractionResponse(BaseModel):
         description="Confidence score of the extraction (0-1)",
         ge=0,
         le=1
-    )
\ No newline at end of file
+    )
+
+class BatchExtractionResponse(BaseModel):
+    filename: Optional[str] = Field(None, description="Name of the uploaded file")
+    result: Optional[ExtractionResponse] = Field(None, description="Extraction result, if the file was processed")
+    error: Optional[str] = Field(None, description="Why the file could not be processed")
@@ -1,38 +1,157 @@
-from typing import Optional
+from typing import Iterable, Optional, Tuple
+from functools import lru_cache, wraps
 import re
+import string
+import time
 from datetime import datetime
+import numpy as np
 from .enums import Gender, BloodType, Religion, MaritalStatus
 from .errors import ValidationError
 
+# Field patterns, compiled once at import
+_RT_RW_RE = re.compile(r'RT\.?\s*\d{1,3}(?:/|\.|\s+)RW\.?\s*\d{1,3}')
+
+# Allowed values for enumerated fields
+_VALID_RELIGIONS = frozenset({'ISLAM', 'KRISTEN', 'KATOLIK', 'HINDU', 'BUDDHA', 'KONGHUCU'})
+_VALID_MARITAL_STATUSES = frozenset({'BELUM KAWIN', 'KAWIN', 'CERAI HIDUP', 'CERAI MATI'})
+_VALID_BLOOD_TYPES = frozenset({'A', 'B', 'AB', 'O', '-'})
+_VALID_GENDERS = frozenset({'LAKI-LAKI', 'PEREMPUAN'})
+_VALID_NATIONALITIES = frozenset({'WNI', 'WNA'})
+
+# Allowed ASCII characters for free-text fields
+_NAME_CHARS = (string.ascii_uppercase + string.whitespace + ".,'-").encode('ascii')
+_BIRTH_PLACE_CHARS = (string.ascii_uppercase + string.whitespace + ".").encode('ascii')
+_NOT_LOWERCASE_CHARS = bytes(c for c in range(128) if not chr(c).islower())
+
+# Per-byte masks for checking all 16 NIK characters at once
+_NIBBLE_HI = int.from_bytes(b'\xf0' * 16, 'big')
+_ASCII_ZEROS = int.from_bytes(b'0' * 16, 'big')
+_ASCII_SIXES = int.from_bytes(b'\x06' * 16, 'big')
+
+# Province codes in use (Aceh 11 through the Papua provinces 91-96), packed
+# into one integer so that a lookup is a shift and a mask
+_PROVINCE_CODES = (
+    11, 12, 13, 14, 15, 16, 17, 18, 19, 21,
+    31, 32, 33, 34, 35, 36,
+    51, 52, 53,
+    61, 62, 63, 64, 65,
+    71, 72, 73, 74, 75, 76,
+    81, 82,
+    91, 92, 93, 94, 95, 96,
+)
+_PROVINCE_MASK = sum(1 << code for code in _PROVINCE_CODES)
+_PROVINCE_TABLE = np.zeros(100, dtype=bool)
+_PROVINCE_TABLE[list(_PROVINCE_CODES)] = True
+
+def _only_chars(value: str, allowed: bytes) -> bool:
+    """Check that value consists solely of the ASCII characters in allowed.
+
+    bytes.translate deletes the allowed bytes using a 256-entry lookup table
+    in C, so anything left over is a disallowed character.
+    """
+    return value.isascii() and not value.encode('ascii').translate(None, allowed)
+
+# Days per month in a non-leap year
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _parse_ddmmyyyy(value: str) -> Optional[Tuple[int, int, int]]:
+    """Parse a DD-MM-YYYY date into a (year, month, day) tuple.
+
+    Returns None if the string is not in that exact layout or is not a real
+    calendar date.
+    """
+    if not isinstance(value, str) or len(value) != 10 or value[2] != '-' or value[5] != '-':
+        return None
+    
+    digits = value[:2] + value[3:5] + value[6:]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    
+    day, month, year = int(value[:2]), int(value[3:5]), int(value[6:])
+    if not 1 <= month <= 12:
+        return None
+    
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    if not 1 <= day <= _DAYS_IN_MONTH[month - 1] + (month == 2 and leap):
+        return None
+    
+    return year, month, day
+
+def _is_uppercase(value: str) -> bool:
+    """Check that value has no lowercase characters, without building an
+    uppercased copy for ASCII input."""
+    if value.isascii():
+        return _only_chars(value, _NOT_LOWERCASE_CHARS)
+    return value == value.upper()
+
+# Current time and the monotonic clock reading it was taken at
+_NOW_CACHE = (float('-inf'), datetime.now())
+_NOW_TTL = 60.0
+
+def _now() -> datetime:
+    """Return the current time, re-read from the system clock at most once
+    every _NOW_TTL seconds."""
+    global _NOW_CACHE
+    checked_at, now = _NOW_CACHE
+    tick = time.monotonic()
+    if tick - checked_at >= _NOW_TTL:
+        now = datetime.now()
+        _NOW_CACHE = (tick, now)
+    return now
+
+# OCR output repeats the same field values (religions, genders, common places),
+# so the pure validators below are memoized. Date validators depend on the
+# current date and are deliberately left uncached.
+def _memoized(validator):
+    """Memoize a single-value validator for string and None inputs.
+    
+    Other values skip the cache and go straight to the validator, so its own
+    type checks handle them instead of lru_cache failing on unhashable input.
+    """
+    cached = lru_cache(maxsize=2048)(validator)
+    
+    @wraps(validator)
+    def wrapper(value, bypass_validation: bool = False) -> bool:
+        if value is None or isinstance(value, str):
+            return cached(value, bypass_validation)
+        return validator(value, bypass_validation)
+    
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+@_memoized
 def validate_nik(nik: str, bypass_validation: bool = False) -> bool:
     """Validate Indonesian NIK (Nomor Induk Kependudukan)."""
     if bypass_validation:
         return True
         
-    if not isinstance(nik, str) or len(nik) != 16:
+    if not isinstance(nik, str) or len(nik) != 16 or not nik.isascii():
         return False
     
-    # Check if all characters are digits
-    if not nik.isdigit():
+    # Check if all characters are digits: every byte must be 0x3X, and adding
+    # 6 must not carry the low nibble out of it (i.e. X <= 9)
+    b = nik.encode('ascii')
+    n = int.from_bytes(b, 'big')
+    if (n & _NIBBLE_HI) != _ASCII_ZEROS or ((n + _ASCII_SIXES) & _NIBBLE_HI) != _ASCII_ZEROS:
         return False
     
-    # Check province code (2 digits: 11-94)
-    province = int(nik[:2])
-    if province < 11 or province > 94:
+    # Check province code against the codes in use
+    province = (b[0] - 48) * 10 + (b[1] - 48)
+    if not (_PROVINCE_MASK >> province) & 1:
         return False
     
     # Check regency/city code (2 digits: 01-99)
-    regency = int(nik[2:4])
-    if regency < 1 or regency > 99:
+    if b[2] == 48 and b[3] == 48:
         return False
     
     # Check district code (2 digits: 01-99)
-    district = int(nik[4:6])
-    if district < 1 or district > 99:
+    if b[4] == 48 and b[5] == 48:
         return False
     
     return True
 
+@_memoized
 def validate_name(name: str, bypass_validation: bool = False) -> bool:
     """Validate person name."""
     if bypass_validation:
@@ -41,35 +160,44 @@ def validate_name(name: str, bypass_validation: bool = False) -> bool:
     if not isinstance(name, str) or len(name) < 2:
         return False
     
-    # Check if name is in uppercase
-    if name != name.upper():
-        return False
-    
-    # Allow letters, spaces, dots, apostrophes, commas, and hyphens
-    pattern = r'^[A-Z\s\.\,\'\-]+$'
-    return bool(re.match(pattern, name))
+    # Allow uppercase letters, spaces, dots, apostrophes, commas, and hyphens
+    return _only_chars(name, _NAME_CHARS)
 
 def validate_date(date_str: str, bypass_validation: bool = False) -> bool:
     """Validate date string in DD-MM-YYYY format."""
     if bypass_validation:
         return True
         
-    if not isinstance(date_str, str):
+    parsed = _parse_ddmmyyyy(date_str)
+    if parsed is None:
         return False
     
-    try:
-        # Parse date string
-        date = datetime.strptime(date_str, '%d-%m-%Y')
-        
-        # Check if year is reasonable (1900-current year)
-        current_year = datetime.now().year
-        if date.year < 1900 or date.year > current_year:
-            return False
-        
-        return True
-    except ValueError:
-        return False
+    # Check if year is reasonable (1900-current year)
+    return 1900 <= parsed[0] <= _now().year
+
+def validate_nik_batch(niks: Iterable[str]) -> np.ndarray:
+    """Validate many NIKs at once, returning a boolean array.
 
+    Applies the same rules as validate_nik, but checks the whole batch with
+    array operations on the characters' code points.
+    """
+    values = np.array(list(niks), dtype=str)
+    if not values.size:
+        return np.zeros(0, dtype=bool)
+    
+    codes = values.astype('U16').view(np.uint32).reshape(-1, 16).astype(np.int64) - 48
+    digits = ((codes >= 0) & (codes <= 9)).all(axis=1)
+    
+    province = np.where(digits, codes[:, 0] * 10 + codes[:, 1], 0)
+    regency = codes[:, 2] * 10 + codes[:, 3]
+    district = codes[:, 4] * 10 + codes[:, 5]
+    
+    return (
+        (np.char.str_len(values) == 16) & digits & _PROVINCE_TABLE[province] &
+        (regency != 0) & (district != 0)
+    )
+
+@_memoized
 def validate_address(address: str, bypass_validation: bool = False) -> bool:
     """Validate address string."""
     if bypass_validation:
@@ -79,13 +207,14 @@ def validate_address(address: str, bypass_validation: bool = False) -> bool:
         return False
     
     # Check if address is in uppercase
-    if address != address.upper():
+    if not _is_uppercase(address):
         return False
     
-    # Check for RT/RW pattern
-    rt_rw_pattern = r'RT\.?\s*\d{1,3}(/|\.|\s+)RW\.?\s*\d{1,3}'
-    return bool(re.search(rt_rw_pattern, address))
+    # Check for RT/RW pattern; the substring test rules out most addresses
+    # without one before the regex engine runs
+    return 'RW' in address and bool(_RT_RW_RE.search(address))
 
+@_memoized
 def validate_religion(religion: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate religion field."""
     if bypass_validation:
@@ -94,12 +223,9 @@ def validate_religion(religion: Optional[str], bypass_validation: bool = False)
     if religion is None:  # Optional field
         return True
     
-    valid_religions = {
-        'ISLAM', 'KRISTEN', 'KATOLIK', 
-        'HINDU', 'BUDDHA', 'KONGHUCU'
-    }
-    return religion in valid_religions
+    return religion in _VALID_RELIGIONS
 
+@_memoized
 def validate_marital_status(status: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate marital status field."""
     if bypass_validation:
@@ -108,12 +234,9 @@ def validate_marital_status(status: Optional[str], bypass_validation: bool = Fal
     if status is None:  # Optional field
         return True
     
-    valid_statuses = {
-        'BELUM KAWIN', 'KAWIN', 
-        'CERAI HIDUP', 'CERAI MATI'
-    }
-    return status in valid_statuses
+    return status in _VALID_MARITAL_STATUSES
 
+@_memoized
 def validate_blood_type(blood_type: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate blood type field."""
     if bypass_validation:
@@ -122,9 +245,9 @@ def validate_blood_type(blood_type: Optional[str], bypass_validation: bool = Fal
     if blood_type is None:  # Optional field
         return True
     
-    valid_types = {'A', 'B', 'AB', 'O', '-'}
-    return blood_type in valid_types
+    return blood_type in _VALID_BLOOD_TYPES
 
+@_memoized
 def validate_gender(gender: str, bypass_validation: bool = False) -> bool:
     """Validate gender field."""
     if bypass_validation:
@@ -133,9 +256,9 @@ def validate_gender(gender: str, bypass_validation: bool = False) -> bool:
     if not isinstance(gender, str):
         return False
     
-    valid_genders = {'LAKI-LAKI', 'PEREMPUAN'}
-    return gender in valid_genders
+    return gender in _VALID_GENDERS
 
+@_memoized
 def validate_nationality(nationality: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate nationality field."""
     if bypass_validation:
@@ -144,9 +267,9 @@ def validate_nationality(nationality: Optional[str], bypass_validation: bool = F
     if nationality is None:  # Optional field
         return True
     
-    valid_nationalities = {'WNI', 'WNA'}
-    return nationality in valid_nationalities
+    return nationality in _VALID_NATIONALITIES
 
+@_memoized
 def validate_occupation(occupation: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate occupation field."""
     if bypass_validation:
@@ -159,7 +282,7 @@ def validate_occupation(occupation: Optional[str], bypass_validation: bool = Fal
     if not isinstance(occupation, str) or len(occupation) < 1:
         return False
     
-    return occupation == occupation.upper()
+    return _is_uppercase(occupation)
 
 def validate_valid_until(valid_until: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate ID validity date."""
@@ -172,18 +295,15 @@ def validate_valid_until(valid_until: Optional[str], bypass_validation: bool = F
     if valid_until == 'SEUMUR HIDUP':
         return True
         
-    try:
-        # Parse date string
-        date = datetime.strptime(valid_until, '%d-%m-%Y')
-        
-        # Check if date is in the future
-        if date < datetime.now():
-            return False
-            
-        return True
-    except ValueError:
+    parsed = _parse_ddmmyyyy(valid_until)
+    if parsed is None:
         return False
+    
+    # Check if date is in the future
+    now = _now()
+    return parsed > (now.year, now.month, now.day)
 
+@_memoized
 def validate_birth_place(birth_place: str, bypass_validation: bool = False) -> bool:
     """Validate birth place field."""
     if bypass_validation:
@@ -192,13 +312,8 @@ def validate_birth_place(birth_place: str, bypass_validation: bool = False) -> b
     if not isinstance(birth_place, str) or len(birth_place) < 2:
         return False
     
-    # Birth place should be uppercase
-    if birth_place != birth_place.upper():
-        return False
-    
-    # Allow letters, spaces, and dots
-    pattern = r'^[A-Z\s\.]+$'
-    return bool(re.match(pattern, birth_place))
+    # Allow uppercase letters, spaces, and dots
+    return _only_chars(birth_place, _BIRTH_PLACE_CHARS)
 
 def validate_validity_date(date_str: Optional[str], bypass_validation: bool = False) -> bool:
     """Validate ID card validity date."""
@@ -1,12 +1,20 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .core.config import get_settings
-from .core.middleware import RateLimitMiddleware, ProcessingTimeMiddleware
-from .core.errors import ErrorHandlingMiddleware
-from .api.routes import router
+from .core.middleware import KTPMiddleware
+from .api.routes import router, warmup_pipeline
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the ML pipeline before the application starts serving."""
+    if settings.WARMUP_MODELS:
+        await warmup_pipeline()
+    yield
+
 def create_application() -> FastAPI:
     app = FastAPI(
         title=settings.PROJECT_NAME,
@@ -14,7 +22,9 @@ def create_application() -> FastAPI:
         version="1.0.0",
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
         docs_url=f"{settings.API_V1_STR}/docs",
-        redoc_url=f"{settings.API_V1_STR}/redoc"
+        redoc_url=f"{settings.API_V1_STR}/redoc",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
 
     # Set up CORS middleware
@@ -26,10 +36,8 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
-    # Add custom middleware
-    app.add_middleware(RateLimitMiddleware)
-    app.add_middleware(ProcessingTimeMiddleware)
-    app.add_middleware(ErrorHandlingMiddleware)
+    # Add custom middleware (timing, rate limiting and error handling)
+    app.add_middleware(KTPMiddleware, requests_per_minute=settings.RATE_LIMIT_PER_MINUTE)
 
     # Include API routes
     app.include_router(router, prefix=settings.API_V1_STR)
@@ -1,10 +1,13 @@
-from typing import Dict, List
+import warnings
+from typing import Dict, List, Optional
 import torch
+import numpy as np
 from transformers import AutoTokenizer, AutoModelForTokenClassification
 import re
 from datetime import datetime
-from ...core.models import KTPData, Gender, BloodType
+from ...core.models import KTPData, Gender, BloodType, MaritalStatus, Religion
 from ...core.config import get_settings
+from functools import lru_cache
 from ...core.validators import (
     validate_nik, validate_name, validate_date,
     validate_address, validate_religion, validate_marital_status
@@ -13,28 +16,62 @@ from ...core.errors import KTPProcessingError
 
 settings = get_settings()
 
+# Birth date layouts seen in OCR output, tried in order
+_DATE_PATTERNS = [
+    re.compile(r"(\d{2})-(\d{2})-(\d{4})"),
+    re.compile(r"(\d{2})/(\d{2})/(\d{4})"),
+    re.compile(r"(\d{2})-(\d{2})-(\d{2})")
+]
+
+# Every ASCII byte except 0-9, for stripping non-digits with bytes.translate
+_NON_DIGITS = bytes(c for c in range(128) if not chr(c).isdigit())
+
+_SPECIAL_TOKENS = frozenset({"[CLS]", "[SEP]", "[PAD]"})
+
+# Address parts merged into the address field, in order
+_ADDRESS_COMPONENTS = (
+    ("address", "{}"),
+    ("rt_rw", "{}"),
+    ("village", "KEL. {}"),
+    ("district", "KEC. {}")
+)
+_REQUIRED_FIELDS = ("nik", "name", "birth_place", "birth_date", "gender", "address")
+
+# Fields backed by an enum in KTPData, with the values each one accepts
+_ENUM_FIELDS = {
+    "blood_type": frozenset(member.value for member in BloodType),
+    "marital_status": frozenset(member.value for member in MaritalStatus),
+    "religion": frozenset(member.value for member in Religion)
+}
+
 class InformationExtractor:
     def __init__(self):
-        # Suppress expected model initialization warnings
-        import warnings
-        warnings.filterwarnings('ignore', message='Some weights of.*were not initialized')
-        
         self.tokenizer = AutoTokenizer.from_pretrained("indolem/indobert-base-uncased")
-        # Initialize with proper token classification weights
-        self.model = AutoModelForTokenClassification.from_pretrained(
-            "indolem/indobert-base-uncased",
-            num_labels=13,  # Number of KTP fields we're extracting
-            ignore_mismatched_sizes=True
-        )
-        
-        # Initialize classifier weights properly
-        import torch.nn as nn
-        self.model.classifier = nn.Linear(768, 13)  # Match BERT hidden size to num_labels
-        nn.init.xavier_uniform_(self.model.classifier.weight)
+        # Load with a freshly initialized token classification head
+        # (its "weights not initialized" warning is expected)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='Some weights of.*were not initialized')
+            self.model = AutoModelForTokenClassification.from_pretrained(
+                "indolem/indobert-base-uncased",
+                num_labels=13,  # Number of KTP fields we're extracting
+                ignore_mismatched_sizes=True
+            )
         
         # Move model to GPU if available
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
+        self.model.eval()
+        
+        # On GPU, run in bfloat16 and compile the forward pass; on CPU, use
+        # int8 weights for the linear layers
+        if self.device.type == "cuda":
+            self.model = self.model.to(torch.bfloat16)
+            if settings.COMPILE_MODELS:
+                self.model = torch.compile(self.model, mode="reduce-overhead", fullgraph=False)
+        elif settings.QUANTIZE_MODELS:
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         
         # Field labels mapping
         self.label2field = {
@@ -55,81 +92,106 @@ class InformationExtractor:
     
     def extract_information(self, text_regions: List[Dict[str, str]]) -> Dict[str, str]:
         """Extract structured information from OCR text regions."""
-        extracted_info = {}
-        
-        # Combine all text for processing
-        full_text = " ".join([region["text"] for region in text_regions])
-        
-        # Tokenize text
+        return self.extract_information_batch([text_regions])[0]
+    
+    def extract_information_batch(self, text_regions_batch: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Extract structured information for several documents in one pass."""
+        # Combine all text of each document for processing
+        full_texts = [
+            " ".join([region["text"] for region in text_regions])
+            for text_regions in text_regions_batch
+        ]
+        
+        # Tokenize texts, padding to the longest sequence
         inputs = self.tokenizer(
-            full_text,
+            full_texts,
             return_tensors="pt",
             truncation=True,
             max_length=512,
             padding=True
-        ).to(self.device)
+        )
+        
+        # Move inputs to device; on GPU, copy from pinned memory without blocking
+        pinned = self.device.type == "cuda"
+        for key, value in inputs.items():
+            if isinstance(value, torch.Tensor):
+                if pinned:
+                    value = value.pin_memory()
+                inputs[key] = value.to(self.device, non_blocking=pinned)
         
         # Get model predictions
-        with torch.no_grad():
+        with torch.inference_mode(), torch.autocast(
+            device_type=self.device.type, dtype=torch.bfloat16, enabled=self.device.type == "cuda"
+        ):
             outputs = self.model(**inputs)
-            predictions = outputs.logits.argmax(-1).squeeze().tolist()
-        
-        # Convert token predictions to field values
-        tokens = self.tokenizer.convert_ids_to_tokens(inputs.input_ids.squeeze().tolist())
-        current_field = None
-        current_value = []
-        
-        for token, pred in zip(tokens, predictions):
-            if pred in self.label2field:
-                if current_field and current_value:
-                    # Process and add previous field
-                    extracted_info[current_field] = self._process_field_value(
-                        current_field,
-                        "".join(current_value).strip()
-                    )
-                current_field = self.label2field[pred]
-                current_value = []
-            elif token not in ["[CLS]", "[SEP]", "[PAD]"]:
-                if current_field:
-                    # Continue building current field value
-                    if token.startswith("##"):
-                        current_value.append(token[2:])
-                    else:
-                        current_value.append(" " + token if current_value else token)
+            predictions = outputs.logits.argmax(-1).cpu().numpy()
         
-        # Add last field if exists
-        if current_field and current_value:
-            extracted_info[current_field] = self._process_field_value(
-                current_field,
-                "".join(current_value).strip()
-            )
+        lengths = inputs.attention_mask.sum(dim=1).tolist()
+        
+        results = []
+        for index, length in enumerate(lengths):
+            tokens = self.tokenizer.convert_ids_to_tokens(inputs.input_ids[index][:length].tolist())
+            results.append(self._collect_fields(tokens, predictions[index][:length]))
+        
+        return results
+    
+    def _collect_fields(self, tokens: List[str], predictions: np.ndarray) -> Dict[str, str]:
+        """Convert the token predictions of one document to field values.
+        
+        Each run of consecutive tokens sharing a label becomes one value for
+        that label's field.
+        """
+        extracted_info = {}
+        
+        # Find where each run of equal labels starts and ends
+        starts = np.flatnonzero(np.diff(predictions, prepend=-1))
+        ends = np.append(starts[1:], len(predictions))
+        
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            field = self.label2field.get(int(predictions[start]))
+            if field is None:
+                continue
+            field_tokens = [token for token in tokens[start:end] if token not in _SPECIAL_TOKENS]
+            if field_tokens:
+                # The tokenizer merges the word pieces back into text
+                value = self._process_field_value(
+                    field,
+                    self.tokenizer.convert_tokens_to_string(field_tokens)
+                )
+                if value is not None:
+                    extracted_info[field] = value
         
         # Post-process specific fields
         self._post_process_fields(extracted_info)
         
         return extracted_info
     
-    def _process_field_value(self, field: str, value: str) -> str:
-        """Process extracted field value based on field type."""
+    def _process_field_value(self, field: str, value: str) -> Optional[str]:
+        """Process extracted field value based on field type.
+        
+        Enum-backed fields come back as None unless they match one of the
+        enum's values, since the uncased tokenizer can produce free text.
+        """
         value = value.strip()
         
         if field == "nik":
             # Extract only digits
+            if value.isascii():
+                return value.encode('ascii').translate(None, _NON_DIGITS).decode('ascii')
             return "".join(filter(str.isdigit, value))
-        elif field in ["birth_place", "name", "religion", "occupation"]:
+        elif field in ["birth_place", "name", "occupation"]:
             # Convert to uppercase and remove extra spaces
             return " ".join(value.upper().split())
+        elif field in _ENUM_FIELDS:
+            # Normalize the same way, then drop values outside the enum
+            value = " ".join(value.upper().split())
+            return value if value in _ENUM_FIELDS[field] else None
         elif field == "birth_date":
             # Try to parse and format date
             try:
                 # Handle various date formats
-                date_patterns = [
-                    r"(\d{2})-(\d{2})-(\d{4})",
-                    r"(\d{2})/(\d{2})/(\d{4})",
-                    r"(\d{2})-(\d{2})-(\d{2})"
-                ]
-                for pattern in date_patterns:
-                    match = re.search(pattern, value)
+                for pattern in _DATE_PATTERNS:
+                    match = pattern.search(value)
                     if match:
                         day, month, year = match.groups()
                         if len(year) == 2:
@@ -153,26 +215,20 @@ class InformationExtractor:
     
     def _post_process_fields(self, extracted_info: Dict[str, str]):
         """Apply post-processing rules to extracted fields."""
-        # Combine address components if separated
-        address_components = []
-        if "address" in extracted_info:
-            address_components.append(extracted_info["address"])
-        if "rt_rw" in extracted_info:
-            address_components.append(extracted_info["rt_rw"])
-        if "village" in extracted_info:
-            address_components.append(f"KEL. {extracted_info['village']}")
-        if "district" in extracted_info:
-            address_components.append(f"KEC. {extracted_info['district']}")
-        
+        # Combine address components if separated, dropping the temporary fields
+        address_components = [
+            template.format(extracted_info.pop(field))
+            for field, template in _ADDRESS_COMPONENTS
+            if field in extracted_info
+        ]
         if address_components:
             extracted_info["address"] = " ".join(address_components)
-            
-        # Clean up temporary fields
-        for field in ["rt_rw", "village", "district"]:
-            extracted_info.pop(field, None)
         
         # Ensure required fields exist
-        required_fields = ["nik", "name", "birth_place", "birth_date", "gender", "address"]
-        for field in required_fields:
-            if field not in extracted_info:
-                extracted_info[field] = ""
\ No newline at end of file
+        for field in _REQUIRED_FIELDS:
+            extracted_info.setdefault(field, "")
+
+@lru_cache(maxsize=1)
+def get_information_extractor() -> InformationExtractor:
+    """Create the shared information extractor, loading its weights on first use."""
+    return InformationExtractor()
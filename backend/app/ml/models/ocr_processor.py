@@ -1,61 +1,101 @@
-import pytesseract
+import warnings
 from PIL import Image
 import numpy as np
+import cv2
 from ...core.config import get_settings
+from functools import lru_cache
 from typing import Dict, List, Tuple
 from transformers import LayoutLMv3Processor, LayoutLMv3ForTokenClassification
 import torch
 
 settings = get_settings()
 
+# Content rules for picking field candidates out of OCR text boxes
+_FIELD_RULES = {
+    "NIK": lambda text: text.isdigit() and len(text) == 16,
+    "name": lambda text: text.isupper() and not any(char.isdigit() for char in text),
+    "birthPlace": lambda text: text.isupper() and len(text) > 2,
+    "birthDate": lambda text: any(char.isdigit() for char in text) and len(text) >= 8,
+    "gender": lambda text: text in ("LAKI-LAKI", "PEREMPUAN"),
+    "address": lambda text: len(text) > 10 and ("RT" in text or "RW" in text)
+}
+
 class OCRProcessor:
     def __init__(self):
-        # Suppress expected model initialization warnings
-        import warnings
-        warnings.filterwarnings('ignore', message='Some weights of.*were not initialized')
-        
         self.processor = LayoutLMv3Processor.from_pretrained("microsoft/layoutlmv3-base")
-        # Initialize with proper token classification weights
-        self.model = LayoutLMv3ForTokenClassification.from_pretrained(
-            "microsoft/layoutlmv3-base",
-            num_labels=13,  # Number of token classes for KTP fields
-            ignore_mismatched_sizes=True
-        )
-        
-        # Initialize classifier weights properly
-        import torch.nn as nn
-        self.model.classifier = nn.Linear(768, 13)  # Match hidden size to num_labels
-        nn.init.xavier_uniform_(self.model.classifier.weight)
+        # Load with a freshly initialized token classification head
+        # (its "weights not initialized" warning is expected)
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='Some weights of.*were not initialized')
+            self.model = LayoutLMv3ForTokenClassification.from_pretrained(
+                "microsoft/layoutlmv3-base",
+                num_labels=13,  # Number of token classes for KTP fields
+                ignore_mismatched_sizes=True
+            )
         
         # Move model to GPU if available
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
+        self.model.eval()
+        
+        # On GPU, run in bfloat16 and compile the forward pass; on CPU, use
+        # int8 weights for the linear layers
+        if self.device.type == "cuda":
+            self.model = self.model.to(torch.bfloat16)
+            if settings.COMPILE_MODELS:
+                self.model = torch.compile(self.model, mode="reduce-overhead", fullgraph=False)
+        elif settings.QUANTIZE_MODELS:
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         
     def process_image(self, image: Image.Image) -> List[Dict[str, str]]:
         """Process an image and extract text with layout information."""
-        # Prepare image for the model
+        return self.process_image_batch([image])[0]
+    
+    def process_image_batch(self, images: List[Image.Image]) -> List[List[Dict[str, str]]]:
+        """Extract text with layout information from several images in one pass."""
+        # Prepare images for the model, padding to the longest token sequence
         encoding = self.processor(
-            image,
+            images,
             return_tensors="pt",
+            padding=True,
             truncation=True,
             max_length=512
         )
         
-        # Move inputs to device
+        # Move inputs to device; on GPU, copy from pinned memory without blocking
+        pinned = self.device.type == "cuda"
         for key, value in encoding.items():
             if isinstance(value, torch.Tensor):
-                encoding[key] = value.to(self.device)
+                if pinned:
+                    value = value.pin_memory()
+                encoding[key] = value.to(self.device, non_blocking=pinned)
         
         # Get model predictions
-        with torch.no_grad():
+        with torch.inference_mode(), torch.autocast(
+            device_type=self.device.type, dtype=torch.bfloat16, enabled=self.device.type == "cuda"
+        ):
             outputs = self.model(**encoding)
             
         # Process outputs
-        predictions = outputs.logits.argmax(-1).squeeze().tolist()
-        token_boxes = encoding.bbox.squeeze().tolist()
-        tokens = self.processor.tokenizer.convert_ids_to_tokens(encoding.input_ids.squeeze().tolist())
+        predictions = outputs.logits.argmax(-1).tolist()
+        token_boxes = encoding.bbox.tolist()
+        lengths = encoding.attention_mask.sum(dim=1).tolist()
+        
+        batch_results = []
+        for index, length in enumerate(lengths):
+            tokens = self.processor.tokenizer.convert_ids_to_tokens(
+                encoding.input_ids[index][:length].tolist()
+            )
+            batch_results.append(self._group_tokens(
+                tokens, token_boxes[index][:length], predictions[index][:length]
+            ))
         
-        # Group results
+        return batch_results
+    
+    def _group_tokens(self, tokens: List[str], token_boxes: List, predictions: List[int]) -> List[Dict[str, str]]:
+        """Merge word-piece tokens of one image into text boxes."""
         results = []
         current_token = {"text": "", "box": None}
         
@@ -81,17 +121,10 @@ class OCRProcessor:
     
     def get_field_candidates(self, text_boxes: List[Dict[str, str]], field_name: str) -> List[str]:
         """Get candidate values for a specific field based on layout and content."""
-        # Field-specific rules for text selection
-        field_rules = {
-            "NIK": lambda text: text.isdigit() and len(text) == 16,
-            "name": lambda text: text.isupper() and not any(char.isdigit() for char in text),
-            "birthPlace": lambda text: text.isupper() and len(text) > 2,
-            "birthDate": lambda text: any(char.isdigit() for char in text) and len(text) >= 8,
-            "gender": lambda text: text in ["LAKI-LAKI", "PEREMPUAN"],
-            "address": lambda text: len(text) > 10 and "RT" in text or "RW" in text
-        }
+        rule = _FIELD_RULES.get(field_name)
+        if rule is None:
+            return [box["text"] for box in text_boxes]
         
-        rule = field_rules.get(field_name, lambda _: True)
         return [box["text"] for box in text_boxes if rule(box["text"])]
     
     def extract_field(self, text_boxes: List[Dict[str, str]], field_name: str) -> str:
@@ -99,45 +132,6 @@ class OCRProcessor:
         candidates = self.get_field_candidates(text_boxes, field_name)
         return candidates[0] if candidates else ""
     
-    def extract_text(self, layout: dict) -> dict:
-        """
-        Extract text from the image regions identified by the document analyzer
-        """
-        text_regions = {}
-        
-        for region in layout['text_regions']:
-            box = region['box']
-            confidence = region['confidence']
-            
-            # Extract coordinates
-            x1, y1, x2, y2 = [int(coord) for coord in box]
-            
-            # Get text from region
-            text = self._extract_region_text(x1, y1, x2, y2)
-            
-            text_regions[f"region_{len(text_regions)}"] = {
-                'text': text,
-                'confidence': confidence,
-                'box': box
-            }
-            
-        return text_regions
-    
-    def _extract_region_text(self, x1: int, y1: int, x2: int, y2: int) -> str:
-        """
-        Extract text from a specific region of the image
-        """
-        try:
-            # Extract text using Tesseract
-            text = pytesseract.image_to_string(
-                np.array(self.current_image.crop((x1, y1, x2, y2))),
-                config=self.config
-            )
-            return text.strip()
-        except Exception as e:
-            print(f"Error extracting text from region: {str(e)}")
-            return ""
-            
     def preprocess_for_ocr(self, image: Image.Image) -> Image.Image:
         """
         Apply specific preprocessing steps for OCR optimization
@@ -145,8 +139,21 @@ class OCRProcessor:
         # Convert to grayscale if not already
         if image.mode != 'L':
             image = image.convert('L')
-            
-        # Apply additional preprocessing if needed
-        # TODO: Add specific preprocessing steps for Indonesian KTP
         
-        return image
\ No newline at end of file
+        # Binarize against the local background so uneven lighting and the
+        # printed KTP pattern drop out behind the text
+        binary = cv2.adaptiveThreshold(
+            np.asarray(image),
+            255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY,
+            31,
+            10
+        )
+        
+        return Image.fromarray(binary)
+
+@lru_cache(maxsize=1)
+def get_ocr_processor() -> OCRProcessor:
+    """Create the shared OCR processor, loading its weights on first use."""
+    return OCRProcessor()
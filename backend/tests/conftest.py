@@ -0,0 +1,9 @@
+import pytest
+
+@pytest.fixture
+def unloaded():
+    """Create model wrappers without running __init__, so no weights are loaded.
+    
+    For testing the pure pre- and post-processing methods of the ML classes.
+    """
+    return lambda cls: cls.__new__(cls)
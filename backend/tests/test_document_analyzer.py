@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.ml.models.document_analyzer import DocumentAnalyzer
+
+@pytest.fixture
+def analyzer(unloaded):
+    return unloaded(DocumentAnalyzer)
+
+def _encoding(boxes, padding=0):
+    # Boxes as LayoutLMv3 encodes them, on a 0-1000 grid
+    return SimpleNamespace(
+        bbox=torch.tensor([boxes + [[0, 0, 0, 0]] * padding]),
+        attention_mask=torch.tensor([[1] * len(boxes) + [0] * padding])
+    )
+
+def test_extract_layout_info_scales_boxes(analyzer):
+    encoding = _encoding([
+        [300, 50, 700, 100],   # header
+        [50, 400, 300, 800],   # photo
+        [350, 250, 800, 300],  # nik
+        [400, 500, 900, 550],  # personal info
+        [600, 900, 950, 950],  # footer
+    ], padding=2)
+    
+    layout_info = analyzer._extract_layout_info(encoding)
+    
+    assert set(layout_info["regions"]) == {"header", "photo", "nik", "personal_info", "footer"}
+    assert layout_info["valid_layout"]
+    
+    # Boxes stay on the 0-1000 grid, areas are fractions of the page
+    photo = layout_info["regions"]["photo"]
+    assert photo["box"] == [50, 400, 300, 800]
+    assert photo["relative_area"] == pytest.approx(0.25 * 0.4)
+    assert analyzer.get_region_coordinates(layout_info, "photo") == (50, 400, 300, 800)
+
+def test_extract_layout_info_bottom_only(analyzer):
+    # Boxes near the bottom right match only the footer
+    layout_info = analyzer._extract_layout_info(_encoding([[600, 950, 950, 990]]))
+    
+    assert set(layout_info["regions"]) == {"footer"}
+    assert not layout_info["valid_layout"]
+    assert analyzer.get_region_coordinates(layout_info, "nik") is None
@@ -1,14 +1,16 @@
+import io
 import pytest
 import numpy as np
 import cv2
 from PIL import Image
 from app.ml.preprocessors.image_preprocessor import ImagePreprocessor
+from app.core.errors import ValidationError
 
 @pytest.fixture
 def preprocessor():
     return ImagePreprocessor()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_image():
     # Create a sample KTP-like image for testing
     width, height = 800, 500
@@ -20,7 +22,7 @@ def sample_image():
     # Convert to PIL Image
     return Image.fromarray(img)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def skewed_image():
     # Create a skewed image for testing perspective correction
     width, height = 800, 500
@@ -38,7 +40,7 @@ def skewed_image():
     
     return Image.fromarray(img)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def noisy_image():
     # Create a noisy image for testing denoising
     width, height = 800, 500
@@ -50,7 +52,7 @@ def noisy_image():
     
     return Image.fromarray(img)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def dark_image():
     # Create a dark image for testing contrast enhancement
     width, height = 800, 500
@@ -62,6 +64,10 @@ def test_init(preprocessor):
     assert preprocessor.target_size == (800, 500)
     assert preprocessor.min_area == 5000
 
+def test_init_rejects_unknown_denoise_mode():
+    with pytest.raises(ValueError):
+        ImagePreprocessor(denoise_mode="median")
+
 def test_resize_image(preprocessor, sample_image):
     # Convert PIL Image to OpenCV format
     img = cv2.cvtColor(np.array(sample_image), cv2.COLOR_RGB2BGR)
@@ -79,7 +85,19 @@ def test_resize_image(preprocessor, sample_image):
     new_ratio = width / height
     assert abs(original_ratio - new_ratio) < 0.1
 
-def test_denoise(preprocessor, noisy_image):
+def test_resize_image_to_fixed_target(sample_image):
+    preprocessor = ImagePreprocessor(target_size=(400, 300), always_resize_to_target=True)
+    img = cv2.cvtColor(np.array(sample_image), cv2.COLOR_RGB2BGR)
+    
+    # Both larger and smaller inputs end up at exactly the target size
+    for image in (img, cv2.resize(img, (200, 125))):
+        resized = preprocessor._resize_image(image)
+        assert resized.shape[:2] == (300, 400)
+
+@pytest.mark.parametrize("denoise_mode", ["quality", "edge", "fast"])
+def test_denoise(noisy_image, denoise_mode):
+    preprocessor = ImagePreprocessor(denoise_mode=denoise_mode)
+    
     # Convert PIL Image to OpenCV format
     img = cv2.cvtColor(np.array(noisy_image), cv2.COLOR_RGB2BGR)
     
@@ -122,6 +140,31 @@ def test_enhance_contrast(preprocessor, dark_image):
     # Verify contrast improvement
     assert enhanced_std > original_std
 
+def test_enhance_contrast_reused_buffers(dark_image):
+    img = cv2.cvtColor(np.array(dark_image), cv2.COLOR_RGB2BGR)
+    other = img.copy()
+    cv2.rectangle(other, (100, 100), (400, 300), (150, 150, 150), -1)
+    
+    reusing = ImagePreprocessor(reuse_buffers=True)
+    first = reusing._enhance_contrast(img)
+    second = reusing._enhance_contrast(other)
+    
+    # Same results as fresh allocation, and earlier outputs are not overwritten
+    plain = ImagePreprocessor()
+    assert np.array_equal(first, plain._enhance_contrast(img))
+    assert np.array_equal(second, plain._enhance_contrast(other))
+
+def test_enhance_contrast_high_contrast_image(preprocessor):
+    # Black and white stripes already have a wide intensity spread
+    img = np.zeros((500, 800, 3), dtype=np.uint8)
+    img[:, ::2] = 200
+    
+    enhanced = preprocessor._enhance_contrast(img)
+    
+    # Only a linear boost is applied, without changing the layout
+    assert enhanced.shape == img.shape
+    assert np.array_equal(enhanced, cv2.convertScaleAbs(img, alpha=1.2, beta=0))
+
 def test_full_preprocessing_pipeline(preprocessor, sample_image):
     # Test complete preprocessing pipeline
     preprocessed = preprocessor.preprocess(sample_image)
@@ -133,6 +176,25 @@ def test_full_preprocessing_pipeline(preprocessor, sample_image):
     assert preprocessed.width <= preprocessor.target_size[0]
     assert preprocessed.height <= preprocessor.target_size[1]
 
+def test_preprocessing_bgr_array(preprocessor, sample_image):
+    # Arrays decoded by OpenCV are accepted without a PIL round-trip
+    img = cv2.cvtColor(np.array(sample_image), cv2.COLOR_RGB2BGR)
+    preprocessed = preprocessor.preprocess(img)
+    
+    assert isinstance(preprocessed, Image.Image)
+    assert preprocessed.width <= preprocessor.target_size[0]
+    assert preprocessed.height <= preprocessor.target_size[1]
+
+def test_preprocess_batch(preprocessor, sample_image, skewed_image):
+    images = [sample_image, skewed_image, sample_image]
+    
+    results = preprocessor.preprocess_batch(images)
+    
+    # Results come back in input order and match single-image preprocessing
+    assert len(results) == len(images)
+    for image, result in zip(images, results):
+        assert np.array_equal(np.asarray(result), np.asarray(preprocessor.preprocess(image)))
+
 def test_preprocessing_with_invalid_input(preprocessor):
     with pytest.raises(Exception):
         preprocessor.preprocess(None)
@@ -140,6 +202,19 @@ def test_preprocessing_with_invalid_input(preprocessor):
     with pytest.raises(Exception):
         preprocessor.preprocess("not an image")
 
+def test_preprocessing_truncated_image(preprocessor, sample_image):
+    # Opened lazily, so the missing data only shows up when pixels are read
+    buffer = io.BytesIO()
+    sample_image.save(buffer, format="PNG")
+    data = buffer.getvalue()
+    
+    with pytest.raises(ValidationError):
+        preprocessor.preprocess(Image.open(io.BytesIO(data[:len(data) // 2])))
+    
+    # With validation bypassed, the original image is handed back
+    truncated = Image.open(io.BytesIO(data[:len(data) // 2]))
+    assert preprocessor.preprocess(truncated, bypass_validation=True) is truncated
+
 def test_preprocessing_empty_image(preprocessor):
     # Create an empty (all white) image
     empty_img = Image.new('RGB', (800, 500), color='white')
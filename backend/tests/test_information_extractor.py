@@ -0,0 +1,61 @@
+import pytest
+from app.core.models import KTPData
+from app.core.enums import BloodType, MaritalStatus, Religion
+
+pytest.importorskip("torch")
+
+from app.ml.models.information_extractor import InformationExtractor
+
+# Field values as the uncased tokenizer decodes them
+DECODED_FIELDS = {
+    "nik": "3171234567890123",
+    "name": "john doe",
+    "birth_place": "jakarta",
+    "birth_date": "01-01-2000",
+    "gender": "laki-laki",
+    "blood_type": "o",
+    "address": "jl. merdeka no. 17",
+    "rt_rw": "rt. 001 / rw. 002",
+    "religion": "islam",
+    "marital_status": "belum kawin",
+    "occupation": "wiraswasta",
+}
+
+@pytest.fixture
+def extractor(unloaded):
+    return unloaded(InformationExtractor)
+
+def _extract(extractor, decoded):
+    extracted_info = {}
+    for field, value in decoded.items():
+        value = extractor._process_field_value(field, value)
+        if value is not None:
+            extracted_info[field] = value
+    extractor._post_process_fields(extracted_info)
+    return extracted_info
+
+@pytest.mark.parametrize("field,value,expected", [
+    ("blood_type", "b", "B"),
+    ("blood_type", " ab ", "AB"),
+    ("blood_type", "gol. darah", None),
+    ("marital_status", "belum  kawin", "BELUM KAWIN"),
+    ("marital_status", "menikah", None),
+    ("religion", "islam", "ISLAM"),
+    ("religion", "protestan", None),
+])
+def test_process_enum_field_value(extractor, field, value, expected):
+    assert extractor._process_field_value(field, value) == expected
+
+def test_decoded_fields_build_ktp_data(extractor):
+    data = KTPData(**_extract(extractor, DECODED_FIELDS))
+    assert data.name == "JOHN DOE"
+    assert data.blood_type is BloodType.O
+    assert data.religion is Religion.ISLAM
+    assert data.marital_status is MaritalStatus.SINGLE
+
+def test_unknown_enum_values_are_dropped(extractor):
+    decoded = {**DECODED_FIELDS, "blood_type": "rh+", "religion": "lainnya", "marital_status": "?"}
+    data = KTPData(**_extract(extractor, decoded))
+    assert data.blood_type is None
+    assert data.religion is None
+    assert data.marital_status is None
@@ -1,14 +1,14 @@
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from app.core.middleware import RateLimitMiddleware, ProcessingTimeMiddleware
+from app.core.middleware import KTPMiddleware
+from app.core.errors import ValidationError
 import time
 import asyncio
 
 def create_test_app(requests_per_minute: int = 60):
     app = FastAPI()
-    app.add_middleware(RateLimitMiddleware, requests_per_minute=requests_per_minute)
-    app.add_middleware(ProcessingTimeMiddleware)
+    app.add_middleware(KTPMiddleware, requests_per_minute=requests_per_minute)
     
     @app.get("/test")
     def test_endpoint():
@@ -24,6 +24,14 @@ def create_test_app(requests_per_minute: int = 60):
         """Health check endpoint."""
         return {"status": "healthy"}
     
+    @app.get("/test/validation-error")
+    def validation_error_endpoint():
+        raise ValidationError("Invalid KTP data")
+    
+    @app.get("/test/unexpected-error")
+    def unexpected_error_endpoint():
+        raise RuntimeError("Something went wrong")
+    
     return app
 
 client = TestClient(create_test_app())
@@ -121,23 +129,41 @@ def test_rate_limit_health_check_bypass():
     # Health check should never be rate limited
     assert all(r.status_code == 200 for r in responses)
 
-@pytest.mark.asyncio
-async def test_rate_limit_cleanup():
-    """Test that old request records are cleaned up."""
-    app = create_test_app()
-    middleware = RateLimitMiddleware(app)
-    test_ip = "127.0.0.1"
-    
-    # Add some test requests
-    now = time.time()
-    old_time = now - 120  # 2 minutes ago
-    middleware.request_history[test_ip] = [old_time]
-    
-    # Run cleanup
-    await middleware._cleanup_old_requests()
-    
-    # Check that old requests were removed
-    assert test_ip not in middleware.request_history
+def test_rate_limit_evicts_cold_clients():
+    """Test that the least recently seen clients are evicted past max_clients."""
+    app = FastAPI()
+    app.add_middleware(KTPMiddleware, requests_per_minute=1, max_clients=2)
+    
+    @app.get("/test")
+    def test_endpoint():
+        return {"status": "ok"}
+    
+    clients = [
+        TestClient(app, headers={"X-Forwarded-For": ip})
+        for ip in ("1.1.1.1", "2.2.2.2", "3.3.3.3")
+    ]
+    
+    # Each client uses up its bucket; the third evicts the first
+    for c in clients:
+        assert c.get("/test").status_code == 200
+    
+    # The evicted client starts over with a full bucket
+    assert clients[0].get("/test").status_code == 200
+    assert clients[2].get("/test").status_code == 429
+
+def test_error_translation():
+    """Test that application errors are turned into JSON error responses."""
+    app = create_test_app(requests_per_minute=100)
+    test_client = TestClient(app)
+    
+    response = test_client.get("/test/validation-error")
+    assert response.status_code == 422
+    assert response.json() == {"error": "Invalid KTP data"}
+    assert "X-Process-Time" in response.headers
+    
+    response = test_client.get("/test/unexpected-error")
+    assert response.status_code == 500
+    assert response.json() == {"error": "An unexpected error occurred"}
 
 def test_processing_time_logging(caplog):
     """Test that processing time is logged correctly."""
@@ -0,0 +1,44 @@
+import pytest
+from pydantic import ValidationError
+from app.core.models import KTPData, ValidatedKTPData
+
+VALID_KTP = {
+    "nik": "3171234567890123",
+    "name": "JOHN DOE",
+    "birth_place": "JAKARTA",
+    "birth_date": "01-01-2000",
+    "gender": "LAKI-LAKI",
+    "address": "JL. MERDEKA NO. 17 RT.001/RW.002",
+    "religion": "ISLAM",
+    "marital_status": "KAWIN",
+    "occupation": "WIRASWASTA",
+    "valid_until": "SEUMUR HIDUP",
+}
+
+def test_ktp_data_skips_format_checks():
+    data = KTPData(**{**VALID_KTP, "nik": "123", "name": "john doe"})
+    assert data.nik == "123"
+    assert data.name == "john doe"
+
+def test_validated_ktp_data_accepts_valid_fields():
+    data = ValidatedKTPData(**VALID_KTP)
+    assert data.nik == VALID_KTP["nik"]
+    assert isinstance(data, KTPData)
+
+def test_validated_ktp_data_rejects_invalid_fields():
+    with pytest.raises(ValidationError):
+        ValidatedKTPData(**{**VALID_KTP, "nik": "123"})
+    
+    with pytest.raises(ValidationError):
+        ValidatedKTPData(**{**VALID_KTP, "address": "JL. MERDEKA"})
+
+def test_nationality_defaults_to_wni():
+    assert KTPData(**VALID_KTP, nationality="").nationality == "WNI"
+    assert ValidatedKTPData(**VALID_KTP, nationality=None).nationality == "WNI"
+
+def test_ktp_data_is_immutable_and_stripped():
+    data = KTPData(**{**VALID_KTP, "name": "  JOHN DOE  "})
+    assert data.name == "JOHN DOE"
+    
+    with pytest.raises(ValidationError):
+        data.name = "JANE DOE"
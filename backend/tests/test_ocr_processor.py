@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("torch")
+
+from app.ml.models.ocr_processor import OCRProcessor
+
+TEXT_BOXES = [
+    {"text": "3171234567890123", "box": [0, 0, 10, 10]},
+    {"text": "317123456789012", "box": [0, 0, 10, 10]},
+    {"text": "JOHN DOE", "box": [0, 0, 10, 10]},
+    {"text": "J", "box": [0, 0, 10, 10]},
+    {"text": "john doe", "box": [0, 0, 10, 10]},
+    {"text": "JAKARTA, 01-01-2000", "box": [0, 0, 10, 10]},
+    {"text": "01/01/2000", "box": [0, 0, 10, 10]},
+    {"text": "LAKI-LAKI", "box": [0, 0, 10, 10]},
+    {"text": "JL. MERDEKA RT.001/RW.002", "box": [0, 0, 10, 10]},
+    {"text": "RW.002", "box": [0, 0, 10, 10]},
+]
+
+@pytest.fixture
+def ocr_processor(unloaded):
+    return unloaded(OCRProcessor)
+
+@pytest.mark.parametrize("field_name,expected", [
+    ("NIK", ["3171234567890123"]),
+    ("name", ["JOHN DOE", "J", "LAKI-LAKI"]),
+    ("birthPlace", [
+        "JOHN DOE", "JAKARTA, 01-01-2000", "LAKI-LAKI",
+        "JL. MERDEKA RT.001/RW.002", "RW.002"
+    ]),
+    ("birthDate", [
+        "3171234567890123", "317123456789012", "JAKARTA, 01-01-2000",
+        "01/01/2000", "JL. MERDEKA RT.001/RW.002"
+    ]),
+    ("gender", ["LAKI-LAKI"]),
+    # Substring checks, so "JAKARTA" counts as mentioning RT
+    ("address", ["JAKARTA, 01-01-2000", "JL. MERDEKA RT.001/RW.002"]),
+])
+def test_get_field_candidates(ocr_processor, field_name, expected):
+    assert ocr_processor.get_field_candidates(TEXT_BOXES, field_name) == expected
+
+def test_get_field_candidates_unknown_field(ocr_processor):
+    # Fields without a rule keep every box
+    assert ocr_processor.get_field_candidates(TEXT_BOXES, "religion") == [
+        box["text"] for box in TEXT_BOXES
+    ]
+
+def test_extract_field(ocr_processor):
+    assert ocr_processor.extract_field(TEXT_BOXES, "NIK") == "3171234567890123"
+    assert ocr_processor.extract_field(TEXT_BOXES[2:5], "NIK") == ""
+
+def test_preprocess_for_ocr_binarizes_unevenly_lit_text(ocr_processor):
+    # A dark text stroke on a background that brightens from left to right
+    background = np.tile(np.linspace(90, 250, 400).astype(np.uint8), (200, 1))
+    pixels = background.copy()
+    pixels[98:102, 20:380] = background[98:102, 20:380] // 3
+    
+    result = ocr_processor.preprocess_for_ocr(Image.fromarray(pixels).convert("RGB"))
+    binary = np.asarray(result)
+    
+    assert result.mode == "L"
+    assert result.size == (400, 200)
+    assert set(np.unique(binary)) <= {0, 255}
+    
+    # The text is black and the background white across the whole gradient
+    assert (binary[98:102, 40:360] == 0).all()
+    assert (binary[20:60, 40:360] == 255).all()
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("torch")
+
+from app.main import app
+from app.api import routes
+
+EXTRACTED_INFO = {
+    "nik": "3171234567890123",
+    "name": "JOHN DOE",
+    "birth_place": "JAKARTA",
+    "birth_date": "01-01-2000",
+    "gender": "LAKI-LAKI",
+    "address": "JL. MERDEKA RT.001/RW.002",
+}
+
+class FakeDocumentAnalyzer:
+    def analyze_layout_batch(self, images):
+        # Treat light images as KTPs and dark ones as something else
+        return [
+            {"is_ktp": np.asarray(image).mean() > 128, "confidence": 0.9}
+            for image in images
+        ]
+
+class FakeOCRProcessor:
+    def process_image_batch(self, images):
+        return [[{"text": "NIK", "box": [0, 0, 10, 10]}] for _ in images]
+
+class FakeInformationExtractor:
+    def extract_information_batch(self, text_regions_batch):
+        return [dict(EXTRACTED_INFO) for _ in text_regions_batch]
+
+@pytest.fixture
+def client(monkeypatch):
+    # Avoid loading model weights; the routes only need the batch methods
+    monkeypatch.setattr(routes, "get_document_analyzer", FakeDocumentAnalyzer)
+    monkeypatch.setattr(routes, "get_ocr_processor", FakeOCRProcessor)
+    monkeypatch.setattr(routes, "get_information_extractor", FakeInformationExtractor)
+    monkeypatch.setattr(routes, "_result_cache", OrderedDict())
+    return TestClient(app)
+
+def _png(value):
+    img = np.full((600, 900, 3), value, dtype=np.uint8)
+    cv2.rectangle(img, (50, 50), (850, 550), (0, 0, 0), 3)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+def test_batch_reports_each_file(client):
+    response = client.post("/api/batch", files=[
+        ("files", ("ktp.png", _png(200), "image/png")),
+        ("files", ("dark.png", _png(30), "image/png")),
+        ("files", ("broken.png", b"not an image", "image/png")),
+    ])
+    
+    assert response.status_code == 200
+    ktp, dark, broken = response.json()
+    
+    assert ktp["filename"] == "ktp.png"
+    assert ktp["error"] is None
+    assert ktp["result"]["ktp_data"]["nik"] == EXTRACTED_INFO["nik"]
+    
+    assert dark["filename"] == "dark.png"
+    assert dark["result"] is None
+    assert "does not appear to be a valid KTP" in dark["error"]
+    
+    assert broken["filename"] == "broken.png"
+    assert broken["result"] is None
+    assert "Could not decode image data" in broken["error"]
+
+def test_extract_rejects_non_ktp(client):
+    response = client.post("/api/extract", files={"file": ("dark.png", _png(30), "image/png")})
+    
+    assert response.status_code == 422
+    assert "does not appear to be a valid KTP" in response.json()["detail"]["error"]
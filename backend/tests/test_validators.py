@@ -1,170 +1,265 @@
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime
+from app.core import validators
 from app.core.validators import (
     validate_nik, validate_name, validate_date,
     validate_address, validate_religion, validate_marital_status,
     validate_blood_type, validate_gender, validate_nationality,
     validate_validity_date, validate_occupation, validate_valid_until,
-    validate_birth_place
+    validate_birth_place, validate_nik_batch
 )
 
-def test_validate_nik():
+NIK_CASES = [
     # Valid NIKs
-    assert validate_nik("3171234567890123")
-    assert validate_nik("3275012304560001")
+    ("3171234567890123", True),
+    ("3275012304560001", True),
     
     # Invalid NIKs
-    assert not validate_nik("123")  # Too short
-    assert not validate_nik("abcdefghijklmnop")  # Non-numeric
-    assert not validate_nik("0071234567890123")  # Invalid province code
-    assert not validate_nik("3100234567890123")  # Invalid regency code
-    assert not validate_nik("3175004567890123")  # Invalid district code
+    ("123", False),  # Too short
+    ("abcdefghijklmnop", False),  # Non-numeric
+    ("0071234567890123", False),  # Invalid province code
+    ("2071234567890123", False),  # Unused province code
+    ("3100234567890123", False),  # Invalid regency code
+    ("3175004567890123", False),  # Invalid district code
+]
 
-def test_validate_name():
+NAME_CASES = [
     # Valid names
-    assert validate_name("JOHN DOE")
-    assert validate_name("MARY JANE O'CONNOR")
-    assert validate_name("ABDUL AL-RAHMAN")
+    ("JOHN DOE", True),
+    ("MARY JANE O'CONNOR", True),
+    ("ABDUL AL-RAHMAN", True),
     
     # Invalid names
-    assert not validate_name("john doe")  # Lowercase
-    assert not validate_name("J")  # Too short
-    assert not validate_name("JOHN123")  # Contains numbers
-    assert not validate_name("")  # Empty string
+    ("john doe", False),  # Lowercase
+    ("J", False),  # Too short
+    ("JOHN123", False),  # Contains numbers
+    ("", False),  # Empty string
+]
 
-def test_validate_date():
+DATE_CASES = [
     # Valid dates
-    assert validate_date("01-01-2000")
-    assert validate_date("31-12-1999")
-    assert validate_date("29-02-2020")  # Leap year
+    ("01-01-2000", True),
+    ("31-12-1999", True),
+    ("29-02-2020", True),  # Leap year
     
     # Invalid dates
-    assert not validate_date("2000-01-01")  # Wrong format
-    assert not validate_date("32-01-2000")  # Invalid day
-    assert not validate_date("29-02-2021")  # Not a leap year
-    assert not validate_date("01-13-2000")  # Invalid month
-    assert not validate_date("01-01-1800")  # Year too early
+    ("01-01-1800", False),  # Year too early
+]
 
-def test_validate_address():
+ADDRESS_CASES = [
     # Valid addresses
-    assert validate_address("JL. MERDEKA NO. 17 RT.001/RW.002")
-    assert validate_address("DESA SUKAMAJU RT 05 RW 02")
-    assert validate_address("KOMP. GRIYA INDAH BLOK A2 RT.010/RW.005")
+    ("JL. MERDEKA NO. 17 RT.001/RW.002", True),
+    ("DESA SUKAMAJU RT 05 RW 02", True),
+    ("KOMP. GRIYA INDAH BLOK A2 RT.010/RW.005", True),
     
     # Invalid addresses
-    assert not validate_address("jalan merdeka")  # Lowercase
-    assert not validate_address("JL. MERDEKA")  # No RT/RW
-    assert not validate_address("")  # Empty string
-    assert not validate_address("RT")  # Too short
+    ("jalan merdeka", False),  # Lowercase
+    ("JL. MERDEKA", False),  # No RT/RW
+    ("", False),  # Empty string
+    ("RT", False),  # Too short
+]
 
-def test_validate_religion():
+RELIGION_CASES = [
     # Valid religions
-    assert validate_religion("ISLAM")
-    assert validate_religion("KRISTEN")
-    assert validate_religion("KATOLIK")
-    assert validate_religion("HINDU")
-    assert validate_religion("BUDDHA")
-    assert validate_religion("KONGHUCU")
-    assert validate_religion(None)  # Optional field
+    ("ISLAM", True),
+    ("KRISTEN", True),
+    ("KATOLIK", True),
+    ("HINDU", True),
+    ("BUDDHA", True),
+    ("KONGHUCU", True),
+    (None, True),  # Optional field
     
     # Invalid religions
-    assert not validate_religion("ANOTHER")
-    assert not validate_religion("Islam")  # Case sensitive
-    assert not validate_religion("")
+    ("ANOTHER", False),
+    ("Islam", False),  # Case sensitive
+    ("", False),
+]
 
-def test_validate_marital_status():
+MARITAL_STATUS_CASES = [
     # Valid statuses
-    assert validate_marital_status("BELUM KAWIN")
-    assert validate_marital_status("KAWIN")
-    assert validate_marital_status("CERAI HIDUP")
-    assert validate_marital_status("CERAI MATI")
-    assert validate_marital_status(None)  # Optional field
+    ("BELUM KAWIN", True),
+    ("KAWIN", True),
+    ("CERAI HIDUP", True),
+    ("CERAI MATI", True),
+    (None, True),  # Optional field
     
     # Invalid statuses
-    assert not validate_marital_status("SINGLE")
-    assert not validate_marital_status("Kawin")  # Case sensitive
-    assert not validate_marital_status("")
+    ("SINGLE", False),
+    ("Kawin", False),  # Case sensitive
+    ("", False),
+]
 
-def test_validate_blood_type():
+BLOOD_TYPE_CASES = [
     # Valid blood types
-    assert validate_blood_type("A")
-    assert validate_blood_type("B")
-    assert validate_blood_type("AB")
-    assert validate_blood_type("O")
-    assert validate_blood_type("-")
-    assert validate_blood_type(None)  # Optional field
+    ("A", True),
+    ("B", True),
+    ("AB", True),
+    ("O", True),
+    ("-", True),
+    (None, True),  # Optional field
     
     # Invalid blood types
-    assert not validate_blood_type("C")
-    assert not validate_blood_type("a")  # Case sensitive
-    assert not validate_blood_type("")
-
-def test_validate_gender():
-    assert validate_gender("LAKI-LAKI") is True
-    assert validate_gender("PEREMPUAN") is True
-    assert validate_gender("MALE") is False
-    assert validate_gender("") is False
-    assert validate_gender(None) is False
-
-def test_validate_nationality():
-    assert validate_nationality("WNI") is True
-    assert validate_nationality("WNA") is True
-    assert validate_nationality(None) is True  # Optional field
-    assert validate_nationality("INDO") is False
-    assert validate_nationality("") is False
-
-def test_validate_occupation():
-    assert validate_occupation("WIRASWASTA") is True
-    assert validate_occupation("PEGAWAI NEGERI") is True
-    assert validate_occupation(None) is True  # Optional field
-    assert validate_occupation("") is False
-    assert validate_occupation("Engineer") is False  # Not uppercase
-
-def test_validate_valid_until():
-    # Test SEUMUR HIDUP case
-    assert validate_valid_until("SEUMUR HIDUP") is True
-    
-    # Test valid future date
-    future_date = (datetime.now() + timedelta(days=365)).strftime('%d-%m-%Y')
-    assert validate_valid_until(future_date) is True
-    
-    # Test invalid past date
-    past_date = (datetime.now() - timedelta(days=365)).strftime('%d-%m-%Y')
-    assert validate_valid_until(past_date) is False
-    
-    # Test invalid format
-    assert validate_valid_until("2025/12/31") is False
-    assert validate_valid_until("") is False
-    assert validate_valid_until(None) is True  # Optional field
-
-def test_validate_birth_place():
-    assert validate_birth_place("JAKARTA") is True
-    assert validate_birth_place("BANDUNG BARAT") is True
-    assert validate_birth_place("KAB. BOGOR") is True
-    assert validate_birth_place("jakarta") is False  # Must be uppercase
-    assert validate_birth_place("JAKARTA123") is False  # No numbers allowed
-    assert validate_birth_place("") is False
-    assert validate_birth_place("A") is False  # Too short
-
-def test_validate_nationality():
+    ("C", False),
+    ("a", False),  # Case sensitive
+    ("", False),
+]
+
+GENDER_CASES = [
+    ("LAKI-LAKI", True),
+    ("PEREMPUAN", True),
+    ("MALE", False),
+    ("", False),
+    (None, False),
+]
+
+NATIONALITY_CASES = [
     # Valid nationalities
-    assert validate_nationality("WNI")
-    assert validate_nationality("WNA")
-    assert validate_nationality(None)  # Optional field
+    ("WNI", True),
+    ("WNA", True),
+    (None, True),  # Optional field
     
     # Invalid nationalities
-    assert not validate_nationality("INDONESIAN")
-    assert not validate_nationality("wni")  # Case sensitive
-    assert not validate_nationality("")
+    ("INDO", False),
+    ("INDONESIAN", False),
+    ("wni", False),  # Case sensitive
+    ("", False),
+]
+
+OCCUPATION_CASES = [
+    ("WIRASWASTA", True),
+    ("PEGAWAI NEGERI", True),
+    (None, True),  # Optional field
+    ("", False),
+    ("Engineer", False),  # Not uppercase
+]
+
+VALID_UNTIL_CASES = [
+    ("SEUMUR HIDUP", True),
+]
+
+BIRTH_PLACE_CASES = [
+    ("JAKARTA", True),
+    ("BANDUNG BARAT", True),
+    ("KAB. BOGOR", True),
+    ("jakarta", False),  # Must be uppercase
+    ("JAKARTA123", False),  # No numbers allowed
+    ("", False),
+    ("A", False),  # Too short
+]
 
-def test_validate_validity_date():
+VALIDITY_DATE_CASES = [
     # Valid dates
-    assert validate_validity_date("01-01-2025")
-    assert validate_validity_date("SEUMUR HIDUP")
-    assert validate_validity_date(None)  # Optional field
-    
-    # Invalid dates
-    assert not validate_validity_date("2025-01-01")  # Wrong format
-    assert not validate_validity_date("32-01-2025")  # Invalid day
-    assert not validate_validity_date("")
-    assert not validate_validity_date("seumur hidup")  # Case sensitive
\ No newline at end of file
+    ("01-01-2025", True),
+    ("SEUMUR HIDUP", True),
+]
+
+# Malformed or impossible dates rejected by every DD-MM-YYYY validator
+COMMON_DATE_CASES = [
+    ("2000-01-01", False),  # Wrong format
+    ("2025/12/31", False),  # Wrong separators
+    ("1-1-2000", False),  # Missing zero padding
+    ("32-01-2000", False),  # Invalid day
+    ("29-02-2021", False),  # Not a leap year
+    ("01-13-2000", False),  # Invalid month
+    ("seumur hidup", False),  # Case sensitive
+    ("", False),
+]
+
+@pytest.fixture(params=[validate_date, validate_valid_until, validate_validity_date],
+                ids=lambda validator: validator.__name__)
+def date_validator(request):
+    return request.param
+
+@pytest.mark.parametrize("value,expected", NIK_CASES)
+def test_validate_nik(value, expected):
+    assert validate_nik(value) is expected
+
+def test_validate_nik_batch():
+    values = [value for value, _ in NIK_CASES] + ["31712345678901234", ""]
+    expected = [expected for _, expected in NIK_CASES] + [False, False]
+    assert validate_nik_batch(values).tolist() == expected
+    assert validate_nik_batch([]).tolist() == []
+
+@pytest.mark.parametrize("value,expected", NAME_CASES)
+def test_validate_name(value, expected):
+    assert validate_name(value) is expected
+
+@pytest.mark.parametrize("value,expected", DATE_CASES)
+def test_validate_date(value, expected):
+    assert validate_date(value) is expected
+
+@pytest.mark.parametrize("value,expected", ADDRESS_CASES)
+def test_validate_address(value, expected):
+    assert validate_address(value) is expected
+
+@pytest.mark.parametrize("value,expected", RELIGION_CASES)
+def test_validate_religion(value, expected):
+    assert validate_religion(value) is expected
+
+@pytest.mark.parametrize("value,expected", MARITAL_STATUS_CASES)
+def test_validate_marital_status(value, expected):
+    assert validate_marital_status(value) is expected
+
+@pytest.mark.parametrize("value,expected", BLOOD_TYPE_CASES)
+def test_validate_blood_type(value, expected):
+    assert validate_blood_type(value) is expected
+
+@pytest.mark.parametrize("value,expected", GENDER_CASES)
+def test_validate_gender(value, expected):
+    assert validate_gender(value) is expected
+
+@pytest.mark.parametrize("value,expected", NATIONALITY_CASES)
+def test_validate_nationality(value, expected):
+    assert validate_nationality(value) is expected
+
+@pytest.mark.parametrize("value,expected", OCCUPATION_CASES)
+def test_validate_occupation(value, expected):
+    assert validate_occupation(value) is expected
+
+@pytest.mark.parametrize("value,expected", VALID_UNTIL_CASES)
+def test_validate_valid_until(value, expected):
+    assert validate_valid_until(value) is expected
+
+@pytest.mark.parametrize("validator", [
+    validate_nik, validate_name, validate_address, validate_gender,
+    validate_occupation, validate_birth_place
+])
+@pytest.mark.parametrize("value", [["3171234567890123"], {"name": "JOHN DOE"}, 123])
+def test_validators_reject_non_string_input(validator, value):
+    # Unhashable values bypass the cache instead of raising TypeError
+    assert validator(value) is False
+    assert validator(value, bypass_validation=True) is True
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Pin the validators' clock to 15 June 2024."""
+    monkeypatch.setattr(validators, "_now", lambda: datetime(2024, 6, 15))
+
+@pytest.mark.parametrize("value,expected", [
+    ("15-06-2025", True),  # A year ahead
+    ("16-06-2024", True),  # Tomorrow
+    ("15-06-2024", False),  # Today is not in the future
+    ("15-06-2023", False),  # A year ago
+])
+def test_validate_valid_until_relative_dates(frozen_now, value, expected):
+    assert validate_valid_until(value) is expected
+
+@pytest.mark.parametrize("value,expected", BIRTH_PLACE_CASES)
+def test_validate_birth_place(value, expected):
+    assert validate_birth_place(value) is expected
+
+@pytest.mark.parametrize("value,expected", VALIDITY_DATE_CASES)
+def test_validate_validity_date(value, expected):
+    assert validate_validity_date(value) is expected
+
+@pytest.mark.parametrize("value,expected", COMMON_DATE_CASES)
+def test_date_validators_reject_malformed(date_validator, value, expected):
+    assert date_validator(value) is expected
+
+@pytest.mark.parametrize("validator,expected", [
+    (validate_date, False),  # Birth date is required
+    (validate_valid_until, True),  # Optional field
+    (validate_validity_date, True),  # Optional field
+])
+def test_date_validators_none(validator, expected):
+    assert validator(None) is expected